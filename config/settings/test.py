@@ -15,7 +15,15 @@ SECRET_KEY = env(
     default="q8lVkJGsIiHcTSQKaWIBsMVPOGnCnF6f7NDGup8KdDNmviSaZVhP0Nq3q3MolmFU",
 )
 # https://docs.djangoproject.com/en/dev/ref/settings/#test-runner
-TEST_RUNNER = "django.test.runner.DiscoverRunner"
+TEST_RUNNER = "safe_transaction_service.utils.test_runner.ParallelRunner"
+
+# DATABASES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#template
+# Test database can be created from an already migrated PostgreSQL template
+DATABASES["default"]["TEST"] = {  # noqa F405
+    "TEMPLATE": env("DATABASE_TEST_TEMPLATE", default=None),
+}
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -29,6 +37,19 @@ CACHES = {
     },
 }
 
+# STORAGES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#storages
+# Keep uploaded files (contract and token logos) in memory
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.InMemoryStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 # PASSWORDS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
@@ -36,6 +57,9 @@ PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 
 # CELERY
 CELERY_ALWAYS_EAGER = True
+# Tasks run in process, so no broker is required. Celery is configured without namespace,
+# so it only reads the broker from `BROKER_URL` setting (or `CELERY_BROKER_URL` environment variable)
+BROKER_URL = "memory://"
 
 # Ganache #2 private key
 ETHEREUM_TEST_PRIVATE_KEY = (
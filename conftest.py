@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from safe_transaction_service.utils.test_runner import (
+    MAX_PARALLEL_TEST_WORKERS,
+    use_worker_redis_database,
+)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_auto_num_workers(config: pytest.Config) -> int:
+    """
+    `-n auto` starts one worker per CPU, capped to the available Redis databases
+    """
+    return min(os.cpu_count() or 1, MAX_PARALLEL_TEST_WORKERS)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def redis_xdist_database(worker_id: str) -> None:
+    """
+    Use a different Redis database for every `pytest-xdist` worker (`gw0`, `gw1`...).
+    Database `0` is kept for non parallel runs
+    """
+    if worker_id != "master":
+        use_worker_redis_database(int(worker_id.removeprefix("gw")))
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers", "slow: tests tagged with `django.test.tag('slow')`"
+    )
+
+
+def pytest_collection_modifyitems(items: list[pytest.Item]) -> None:
+    """
+    Expose Django test tags as pytest markers, so `pytest -m "not slow"` behaves
+    like `manage.py test --exclude-tag slow`
+    """
+    for item in items:
+        tags = set(getattr(item.cls, "tags", ())) | set(
+            getattr(getattr(item, "obj", None), "tags", ())
+        )
+        for tag_name in tags:
+            item.add_marker(tag_name)
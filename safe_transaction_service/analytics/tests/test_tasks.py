@@ -14,7 +14,7 @@ from safe_transaction_service.utils.redis import get_redis
 class TestTasks(TestCase):
     def test_get_transactions_per_safe_apps(self):
         redis = get_redis()
-        redis.flushall()
+        redis.flushdb()
         redis_key = AnalyticsService.REDIS_TRANSACTIONS_PER_SAFE_APP
         origin_1 = {"url": "https://example1.com", "name": "SafeApp1"}
         origin_2 = {"url": "https://example2.com", "name": "SafeApp2"}
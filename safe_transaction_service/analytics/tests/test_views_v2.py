@@ -15,7 +15,7 @@ from ..tasks import get_transactions_per_safe_app_task
 class TestViewsV2(SafeTestCaseMixin, APITestCase):
     def test_analytics_multisig_txs_by_origin_view(self):
         redis = get_redis()
-        redis.flushall()
+        redis.flushdb()
         response = self.client.get(
             reverse("v2:analytics:analytics-multisig-txs-by-origin")
         )
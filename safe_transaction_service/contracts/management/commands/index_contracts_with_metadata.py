@@ -1,3 +1,5 @@
+from typing import Any, Dict
+
 from django.core.management.base import BaseCommand
 
 from ...tasks import (
@@ -25,27 +27,27 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        reindex = options["reindex"]
-        sync = options["sync"]
+        self.index_contracts(options["reindex"], options["sync"])
 
+    def index_contracts(self, reindex: bool, sync: bool) -> Dict[str, Any]:
+        """
+        :param reindex: reindex contracts already indexed instead of only the missing ones
+        :param sync: run the task synchronously instead of sending it to the queue
+        :return: Dictionary with the called `task` name and `sent` if it was sent to the queue
+        """
         if reindex:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    "Calling `reindex_contracts_without_metadata_task` task"
-                )
-            )
+            task_name = "reindex_contracts_without_metadata_task"
             task = reindex_contracts_without_metadata_task
         else:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    "Calling `create_missing_contracts_with_metadata_task` task"
-                )
-            )
+            task_name = "create_missing_contracts_with_metadata_task"
             task = create_missing_contracts_with_metadata_task
 
+        self.stdout.write(self.style.SUCCESS(f"Calling `{task_name}` task"))
         if sync:
             task()
             self.stdout.write(self.style.SUCCESS("Processing finished"))
         else:
             task.delay()
             self.stdout.write(self.style.SUCCESS("Task was sent"))
+
+        return {"task": task_name, "sent": not sync}
@@ -1,5 +1,6 @@
 import logging
-from typing import List, Tuple
+from functools import cache
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 from django.core.files import File
 from django.core.management import BaseCommand, CommandError
@@ -12,6 +13,8 @@ from safe_transaction_service.contracts.models import Contract
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LOGO_PATH = f"{STATICFILES_DIRS[0]}/safe/safe_contract_logo.png"
+
 TRUSTED_FOR_DELEGATE_CALL = [
     "MultiSendCallOnly",
     "SignMessageLib",
@@ -36,6 +39,152 @@ def generate_safe_contract_display_name(contract_name: str, version: str) -> str
         return f"{contract_name} {version}"
 
 
+def populate_safe_contracts(
+    ethereum_client: EthereumClient,
+    versions: Optional[List[str]] = None,
+    force_update_contracts: bool = False,
+    logo_path: str = DEFAULT_LOGO_PATH,
+) -> Sequence[Tuple[str, str, str]]:
+    """
+    Create or update Safe contracts with default data for the chain of the provided `ethereum_client`.
+    If the chain is not listed on safe_deployments, default deployments found on chain will be used.
+
+    :param ethereum_client: Ethereum client
+    :param versions: list of Safe versions. If not provided, every supported version will be used
+    :param force_update_contracts: update the name and display name for existing contracts
+    :param logo_path: path of the logo to store for every contract
+    :return: list of (version, contract_name, contract_address) created or updated
+    """
+    versions = versions or list(safe_deployments.keys())
+    chain_id = ethereum_client.get_chain_id()
+
+    if force_update_contracts:
+        # update all safe contract names
+        queryset = Contract.objects.update_or_create
+    else:
+        # only update the contracts with empty values
+        queryset = Contract.objects.get_or_create
+
+    if not (
+        chain_deployments := get_deployments_by_chain_and_version(
+            tuple(versions), str(chain_id)
+        )
+    ):
+        # If the chain is not listed on safe_deployments, then Search on chain
+        logger.warning("Creating default Safe contracts from chain")
+
+        chain_deployments = _get_default_deployments_by_version_on_chain(
+            versions, ethereum_client
+        )
+
+    if chain_deployments:
+        with open(logo_path, "rb") as logo:
+            _create_or_update_contracts_from_deployments(
+                chain_deployments, queryset, force_update_contracts, File(logo)
+            )
+    else:
+        logger.warning(f"No deployment was found for the network {chain_id}")
+
+    return chain_deployments
+
+
+@cache
+def get_deployments_by_chain_and_version(
+    versions: Tuple[str, ...], chain_id: str
+) -> Tuple[Tuple[str, str, str], ...]:
+    """
+    Get the list of contracts for the given versions and chain.
+    Result is cached, as `safe_deployments` is static
+
+    :param versions: tuple of versions
+    :param chain_id: chain id
+    :return: tuple of (version, contract_name, contract_address)
+    """
+    return tuple(
+        (version, contract_name, contract_address)
+        for version in versions
+        for contract_name, addresses in safe_deployments[version].items()
+        for contract_address in addresses.get(chain_id, [])
+    )
+
+
+def _get_default_deployments_by_version_on_chain(
+    versions: List[str], ethereum_client: EthereumClient
+) -> List[Tuple[str, str, str]]:
+    """
+    Get the default deployments by version actually deployed on chain.
+
+    :param versions: list of versions
+    :param ethereum_client: Ethereum client
+    :return: list of (version, contract_name, contract_address)
+    """
+    chain_deployments: List[Tuple[str, str, str]] = []
+    for version in versions:
+        for contract_name, addresses in default_safe_deployments[version].items():
+            for contract_address in addresses:
+                if ethereum_client.is_contract(contract_address):
+                    chain_deployments.append((version, contract_name, contract_address))
+
+    return chain_deployments
+
+
+def build_safe_contracts_data(
+    deployments: Sequence[Tuple[str, str, str]],
+) -> Iterator[Tuple[str, str, str, bool]]:
+    """
+    Build Safe contracts default data.
+
+    :param deployments: list of (version, contract_name, contract_address)
+    :return: (address, name, display_name, trusted_for_delegate_call) for every deployment
+    """
+    for version, contract_name, contract_address in deployments:
+        yield (
+            contract_address,
+            contract_name,
+            generate_safe_contract_display_name(contract_name, version),
+            contract_name in TRUSTED_FOR_DELEGATE_CALL,
+        )
+
+
+def _create_or_update_contracts_from_deployments(
+    deployments: Sequence[Tuple[str, str, str]],
+    queryset,
+    force_update_contracts: bool,
+    logo_file: File,
+) -> None:
+    """
+    Create or update contracts from given deployments list.
+    """
+    for (
+        address,
+        name,
+        display_name,
+        trusted_for_delegate_call,
+    ) in build_safe_contracts_data(deployments):
+        contract, created = queryset(
+            address=address,
+            defaults={
+                "name": name,
+                "display_name": display_name,
+                "trusted_for_delegate_call": trusted_for_delegate_call,
+            },
+        )
+
+        if not created:
+            # Remove previous logo file
+            contract.logo.delete(save=True)
+            # update name only for contracts with empty names
+            if not force_update_contracts and contract.name == "":
+                contract.display_name = display_name
+                contract.name = name
+
+        try:
+            contract.logo.save(f"{contract.address}.png", logo_file)
+            contract.save()
+        except OSError:
+            logger.warning("Logo cannot be stored.")
+
+
 class Command(BaseCommand):
     help = "Create or update the Safe contracts with default data. A different logo can be provided"
 
@@ -54,7 +203,7 @@ class Command(BaseCommand):
             type=str,
             help="Path of new logo",
             required=False,
-            default=f"{STATICFILES_DIRS[0]}/safe/safe_contract_logo.png",
+            default=DEFAULT_LOGO_PATH,
         )
 
     def handle(self, *args, **options):
@@ -66,11 +215,6 @@ class Command(BaseCommand):
         :return:
         """
         safe_version = options["safe_version"]
-        force_update_contracts = options["force_update_contracts"]
-        logo_path = options["logo_path"]
-        ethereum_client = get_auto_ethereum_client()
-        chain_id = ethereum_client.get_chain_id()
-        logo_file = File(open(logo_path, "rb"))
         if not safe_version:
             versions = list(safe_deployments.keys())
         elif safe_version in safe_deployments:
@@ -80,105 +224,9 @@ class Command(BaseCommand):
                 f"Wrong Safe version {safe_version}, supported versions {safe_deployments.keys()}"
             )
 
-        if force_update_contracts:
-            # update all safe contract names
-            queryset = Contract.objects.update_or_create
-        else:
-            # only update the contracts with empty values
-            queryset = Contract.objects.get_or_create
-
-        if not (
-            chain_deployments := self._get_deployments_by_chain_and_version(
-                versions, str(chain_id)
-            )
-        ):
-            # If the chain is not listed on safe_deployments, then Search on chain
-            logger.warning("Creating default Safe contracts from chain")
-
-            chain_deployments = self._get_default_deployments_by_version_on_chain(
-                versions, ethereum_client
-            )
-
-        if chain_deployments:
-            self._create_or_update_contracts_from_deployments(
-                chain_deployments, queryset, force_update_contracts, logo_file
-            )
-        else:
-            logger.warning(f"No deployment was found for the network {chain_id}")
-
-    @staticmethod
-    def _get_deployments_by_chain_and_version(
-        versions: List[str], chain_id: str
-    ) -> List[Tuple[str, str, str]]:
-        """
-        Get the list of contracts for the given versions and chain.
-
-        :param versions: list of versions
-        :param chain_id: chain id
-        :return: list of (version, contract_name, contract_address)
-        """
-        chain_deployments: List[Tuple[str, str, str]] = []
-        for version in versions:
-            for contract_name, addresses in safe_deployments[version].items():
-                for contract_address in addresses.get(chain_id, []):
-                    chain_deployments.append((version, contract_name, contract_address))
-
-        return chain_deployments
-
-    @staticmethod
-    def _get_default_deployments_by_version_on_chain(
-        versions: List[str], ethereum_client: EthereumClient
-    ) -> List[Tuple[str, str, str]]:
-        """
-        Get the default deployments by version actually deployed on chain.
-
-        :param versions: list of versions
-        :param ethereum_client: Ethereum client
-        :return: list of (version, contract_name, contract_address)
-        """
-        chain_deployments: List[Tuple[str, str, str]] = []
-        for version in versions:
-            for contract_name, addresses in default_safe_deployments[version].items():
-                for contract_address in addresses:
-                    if ethereum_client.is_contract(contract_address):
-                        chain_deployments.append(
-                            (version, contract_name, contract_address)
-                        )
-
-        return chain_deployments
-
-    @staticmethod
-    def _create_or_update_contracts_from_deployments(
-        deployments: List[Tuple[str, str, str]],
-        queryset,
-        force_update_contracts: bool,
-        logo_file: File,
-    ) -> None:
-        """
-        Create or update contracts from given deployments list.
-        """
-        for version, contract_name, contract_address in deployments:
-            display_name = generate_safe_contract_display_name(contract_name, version)
-            contract, created = queryset(
-                address=contract_address,
-                defaults={
-                    "name": contract_name,
-                    "display_name": display_name,
-                    "trusted_for_delegate_call": contract_name
-                    in TRUSTED_FOR_DELEGATE_CALL,
-                },
-            )
-
-            if not created:
-                # Remove previous logo file
-                contract.logo.delete(save=True)
-                # update name only for contracts with empty names
-                if not force_update_contracts and contract.name == "":
-                    contract.display_name = display_name
-                    contract.name = contract_name
-
-            try:
-                contract.logo.save(f"{contract.address}.png", logo_file)
-                contract.save()
-            except OSError:
-                logger.warning("Logo cannot be stored.")
+        populate_safe_contracts(
+            get_auto_ethereum_client(),
+            versions=versions,
+            force_update_contracts=options["force_update_contracts"],
+            logo_path=options["logo_path"],
+        )
@@ -1,11 +1,29 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
 import factory
 from eth_account import Account
 from factory.django import DjangoModelFactory
+from PIL import Image
 from safe_eth.eth.tests.clients.mocks import sourcify_safe_metadata
 
 from ..models import Contract, ContractAbi
 
 
+def _build_logo() -> bytes:
+    """
+    :return: 1x1 PNG image. Contract logo is processed by Pillow when stored,
+        so it must be a valid image
+    """
+    with BytesIO() as buffer:
+        Image.new("RGB", (1, 1), "green").save(buffer, "PNG")
+        return buffer.getvalue()
+
+
+LOGO = _build_logo()
+
+
 class ContractAbiFactory(DjangoModelFactory):
     class Meta:
         model = ContractAbi
@@ -40,6 +58,8 @@ class ContractFactory(DjangoModelFactory):
     address = factory.LazyFunction(lambda: Account.create().address)
     name = factory.Faker("cryptocurrency_name")
     display_name = ""
-    logo = factory.django.ImageField(color="green")
+    logo = factory.LazyFunction(
+        lambda: SimpleUploadedFile("logo.png", LOGO, content_type="image/png")
+    )
     contract_abi = factory.SubFactory(ContractAbiFactory)
     trusted_for_delegate_call = False
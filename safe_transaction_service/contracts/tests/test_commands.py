@@ -1,134 +1,236 @@
+import hashlib
 from io import StringIO
+from typing import Dict, Tuple
 from unittest.mock import MagicMock, patch
 
 from django.core.management import call_command
-from django.test import TestCase
-
-from safe_eth.eth import EthereumClient
-
+from django.db.models.fields.files import FieldFile
+from django.test import SimpleTestCase, TestCase
+
+from eth_typing import ChecksumAddress
+from safe_eth.eth import EthereumClient, get_auto_ethereum_client
+from safe_eth.safe.safe_deployments import safe_deployments
+
+from safe_transaction_service.contracts.management.commands.index_contracts_with_metadata import (
+    Command as IndexContractsWithMetadataCommand,
+)
+from safe_transaction_service.contracts.management.commands.setup_safe_contracts import (
+    build_safe_contracts_data,
+    get_deployments_by_chain_and_version,
+    populate_safe_contracts,
+)
 from safe_transaction_service.contracts.models import Contract
 from safe_transaction_service.contracts.tests.factories import ContractFactory
 
 
-class TestCommands(TestCase):
-    def test_index_contracts_with_metadata(self):
-        command = "index_contracts_with_metadata"
+def logo_digest(logo: FieldFile) -> bytes:
+    """
+    :return: Short digest of the logo, to compare logos without keeping their content
+    """
+    return hashlib.blake2b(logo.read(), digest_size=8).digest()
+
+
+class AssertContractsMixin:
+    def _assert_contracts(
+        self, expected: Dict[ChecksumAddress, Tuple[str, str, bool]]
+    ) -> None:
+        """
+        Fetch every expected contract using just one query and check them
+
+        :param expected: Dictionary of contract address to (name, display_name, trusted_for_delegate_call)
+        """
+        with self.assertNumQueries(1):
+            contracts = Contract.objects.in_bulk(list(expected))
+
+        for address, expected_contract in expected.items():
+            contract = contracts[address]
+            self.assertEqual(
+                (
+                    contract.name,
+                    contract.display_name,
+                    contract.trusted_for_delegate_call,
+                ),
+                expected_contract,
+                f"Contract {address} does not match",
+            )
 
+
+class TestIndexContractsWithMetadataCommand(SimpleTestCase):
+    @patch(
+        "safe_transaction_service.contracts.management.commands.index_contracts_with_metadata.reindex_contracts_without_metadata_task"
+    )
+    @patch(
+        "safe_transaction_service.contracts.management.commands.index_contracts_with_metadata.create_missing_contracts_with_metadata_task"
+    )
+    def test_index_contracts_with_metadata(
+        self,
+        create_missing_contracts_with_metadata_task_mock: MagicMock,
+        reindex_contracts_without_metadata_task_mock: MagicMock,
+    ):
         buf = StringIO()
-        call_command(command, stdout=buf)
+        command = IndexContractsWithMetadataCommand(stdout=buf)
+        self.assertEqual(
+            command.index_contracts(reindex=False, sync=False),
+            {"task": "create_missing_contracts_with_metadata_task", "sent": True},
+        )
+        create_missing_contracts_with_metadata_task_mock.delay.assert_called_once_with()
+        text = buf.getvalue()
         self.assertIn(
-            "Calling `create_missing_contracts_with_metadata_task` task", buf.getvalue()
+            "Calling `create_missing_contracts_with_metadata_task` task", text
         )
-        self.assertIn("Task was sent", buf.getvalue())
+        self.assertIn("Task was sent", text)
 
+        # Run the command entrypoint to check the `--reindex` and `--sync` arguments
         buf = StringIO()
-        call_command(command, "--reindex", "--sync", stdout=buf)
-        self.assertIn(
-            "Calling `reindex_contracts_without_metadata_task` task", buf.getvalue()
-        )
-        self.assertIn("Processing finished", buf.getvalue())
+        call_command("index_contracts_with_metadata", "--reindex", "--sync", stdout=buf)
+        reindex_contracts_without_metadata_task_mock.assert_called_once_with()
+        reindex_contracts_without_metadata_task_mock.delay.assert_not_called()
+        text = buf.getvalue()
+        self.assertIn("Calling `reindex_contracts_without_metadata_task` task", text)
+        self.assertIn("Processing finished", text)
+
 
-    @patch.object(EthereumClient, "get_chain_id", autospec=True, return_value=137)
-    def test_setup_safe_contracts(self, mock_chain_id: MagicMock):
+class TestSetupSafeContractsFromChainCommand(TestCase):
+    @patch(
+        "safe_transaction_service.contracts.management.commands.setup_safe_contracts.EthereumClient.is_contract"
+    )
+    @patch.object(EthereumClient, "get_chain_id", return_value=2)
+    def test_setup_safe_contracts_from_chain(
+        self, mock_chain_id: MagicMock, mock_is_contract: MagicMock
+    ):
         command = "setup_safe_contracts"
         buf = StringIO()
-        random_contract = ContractFactory()
-        previous_random_contract_logo = random_contract.logo.read()
-        multisend_address = "0x40A2aCCbd92BCA938b02010E17A5b8929b49130D"
-        multisend_contract = ContractFactory(
-            address=multisend_address, name="GnosisMultisend"
+        self.assertEqual(Contract.objects.count(), 0)
+        with self.subTest("No Safe contracts deployed on chain"):
+            mock_is_contract.return_value = False
+            call_command(command, stdout=buf)
+            self.assertEqual(Contract.objects.count(), 0)
+
+        with self.subTest("Just MultiSend v1.4.1 deployed on chain"):
+            mulsisend_address = "0x38869bf66a61cF6bDB996A6aE40D5853Fd43B526"
+            contract_addresses_on_chain = frozenset({mulsisend_address})
+            mock_is_contract.side_effect = contract_addresses_on_chain.__contains__
+            call_command(command, stdout=buf)
+            self.assertEqual(Contract.objects.count(), 1)
+            contract = Contract.objects.get(address=mulsisend_address)
+            self.assertEqual(contract.name, "MultiSend")
+            self.assertEqual(contract.display_name, "Safe: MultiSend 1.4.1")
+
+
+class TestPopulateSafeContracts(AssertContractsMixin, TestCase):
+    multisend_address = "0x40A2aCCbd92BCA938b02010E17A5b8929b49130D"
+
+    @classmethod
+    def setUpClass(cls):
+        # Patch before `setUpTestData` is called
+        cls.mock_chain_id = cls.enterClassContext(
+            patch.object(EthereumClient, "get_chain_id", return_value=137)
         )
-        multisend_contract_logo = multisend_contract.logo.read()
+        super().setUpClass()
 
-        call_command(command, stdout=buf)
-        current_multisend_contract = Contract.objects.get(address=multisend_address)
+    @classmethod
+    def setUpTestData(cls):
+        cls.random_contract = ContractFactory()
+        cls.multisend_contract = ContractFactory(
+            address=cls.multisend_address, name="GnosisMultisend"
+        )
+        # Logos are read just once, before the command updates them
+        cls.reference_logo_digests: Dict[ChecksumAddress, bytes] = {
+            contract.address: logo_digest(contract.logo)
+            for contract in (cls.random_contract, cls.multisend_contract)
+        }
+
+        populate_safe_contracts(get_auto_ethereum_client())
+
+    def test_multisend_logo_updated(self):
+        current_multisend_contract = Contract.objects.get(
+            address=self.multisend_address
+        )
         # Previous created contracts logo should be updated
         self.assertNotEqual(
-            current_multisend_contract.logo.read(), multisend_contract_logo
+            logo_digest(current_multisend_contract.logo),
+            self.reference_logo_digests[self.multisend_address],
         )
 
         # Previous created contracts name and display name should keep unchanged
-        self.assertEqual(multisend_contract.name, current_multisend_contract.name)
+        self.assertEqual(self.multisend_contract.name, current_multisend_contract.name)
         self.assertEqual(
-            multisend_contract.display_name, current_multisend_contract.display_name
+            self.multisend_contract.display_name,
+            current_multisend_contract.display_name,
         )
 
-        # No safe contract logos should keep unchanged
-        current_no_safe_contract_logo: bytes = Contract.objects.get(
-            address=random_contract.address
-        ).logo.read()
-        self.assertEqual(current_no_safe_contract_logo, previous_random_contract_logo)
+    def test_no_safe_contract_logo_unchanged(self):
+        address = self.random_contract.address
+        current_no_safe_contract_logo = Contract.objects.get(address=address).logo
+        self.assertEqual(
+            logo_digest(current_no_safe_contract_logo),
+            self.reference_logo_digests[address],
+        )
 
-        # Missing safe addresses should be added
+    def test_missing_safe_contracts_added(self):
         self.assertEqual(Contract.objects.count(), 31)
 
-        # Contract name and display name should be correctly generated
-        safe_l2_130_address = "0x3E5c63644E683549055b9Be8653de26E0B4CD36E"
-        contract = Contract.objects.get(address=safe_l2_130_address)
-        self.assertEqual(contract.name, "GnosisSafeL2")
-        self.assertEqual(contract.display_name, "SafeL2 1.3.0")
-        self.assertFalse(contract.trusted_for_delegate_call)
-
-        safe_multisend_130_address = "0xA238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761"
-        contract = Contract.objects.get(address=safe_multisend_130_address)
-        self.assertEqual(contract.name, "MultiSend")
-        self.assertEqual(contract.display_name, "Safe: MultiSend 1.3.0")
-
+    def test_force_update_renames(self):
         # Force to update contract names should update the name and display name of the contract
-        call_command(
-            command,
-            "--force-update-contracts",
-            stdout=buf,
+        populate_safe_contracts(get_auto_ethereum_client(), force_update_contracts=True)
+        self._assert_contracts(
+            {
+                # MultiSendCallOnly should be trusted for delegate calls
+                self.multisend_address: (
+                    "MultiSendCallOnly",
+                    "Safe: MultiSendCallOnly 1.3.0",
+                    True,
+                ),
+                "0x9641d764fc13c8B624c04430C7356C1C7C8102e2": (
+                    "MultiSendCallOnly",
+                    "Safe: MultiSendCallOnly 1.4.1",
+                    True,
+                ),
+                # SafeToL2Migration should be untrusted for delegate calls
+                "0xfF83F6335d8930cBad1c0D439A841f01888D9f69": (
+                    "SafeToL2Migration",
+                    "SafeToL2Migration 1.4.1",
+                    False,
+                ),
+                # SignMessageLib should be trusted for delegate calls
+                "0xd53cd0aB83D845Ac265BE939c57F53AD838012c9": (
+                    "SignMessageLib",
+                    "Safe: SignMessageLib 1.4.1",
+                    True,
+                ),
+            }
         )
-        contract = Contract.objects.get(address=multisend_address)
-        self.assertEqual(contract.name, "MultiSendCallOnly")
-        self.assertEqual(contract.display_name, "Safe: MultiSendCallOnly 1.3.0")
-        # MultiSendCallOnly should be trusted for delegate calls
-        self.assertTrue(contract.trusted_for_delegate_call)
-
-        multisend_141_address = "0x9641d764fc13c8B624c04430C7356C1C7C8102e2"
-        contract = Contract.objects.get(address=multisend_141_address)
-        self.assertEqual(contract.name, "MultiSendCallOnly")
-        self.assertEqual(contract.display_name, "Safe: MultiSendCallOnly 1.4.1")
-        # MultiSendCallOnly should be trusted for delegate calls
-        self.assertTrue(contract.trusted_for_delegate_call)
-
-        safe_to_l2_migration = "0xfF83F6335d8930cBad1c0D439A841f01888D9f69"
-        contract = Contract.objects.get(address=safe_to_l2_migration)
-        self.assertEqual(contract.name, "SafeToL2Migration")
-        self.assertEqual(contract.display_name, "SafeToL2Migration 1.4.1")
-        # SafeToL2Migration should be untrusted for delegate calls
-        self.assertFalse(contract.trusted_for_delegate_call)
-
-        sign_message_lib = "0xd53cd0aB83D845Ac265BE939c57F53AD838012c9"
-        contract = Contract.objects.get(address=sign_message_lib)
-        self.assertEqual(contract.name, "SignMessageLib")
-        self.assertEqual(contract.display_name, "Safe: SignMessageLib 1.4.1")
-        # SignMessageLib should be trusted for delegate calls
-        self.assertTrue(contract.trusted_for_delegate_call)
 
-    @patch(
-        "safe_transaction_service.contracts.management.commands.setup_safe_contracts.EthereumClient.is_contract"
-    )
-    @patch.object(EthereumClient, "get_chain_id", autospec=True, return_value=2)
-    def test_setup_safe_contracts_from_chain(
-        self, mock_chain_id: MagicMock, mock_is_contract: MagicMock
-    ):
-        command = "setup_safe_contracts"
-        buf = StringIO()
-        mock_is_contract.return_value = False
-        self.assertEqual(Contract.objects.count(), 0)
-        call_command(command, stdout=buf)
-        self.assertEqual(Contract.objects.count(), 0)
 
-        # Mock is contract to return True in case of provided address is equal to MultiSend v1.4.1 address
-        mulsisend_address = "0x38869bf66a61cF6bDB996A6aE40D5853Fd43B526"
-        mock_is_contract.side_effect = lambda contract_address: (
-            True if contract_address == mulsisend_address else False
+class TestBuildSafeContractsData(AssertContractsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        contracts_data = build_safe_contracts_data(
+            get_deployments_by_chain_and_version(tuple(safe_deployments), "137")
+        )
+        Contract.objects.bulk_create(
+            Contract(
+                address=address,
+                name=name,
+                display_name=display_name,
+                trusted_for_delegate_call=trusted_for_delegate_call,
+            )
+            for address, name, display_name, trusted_for_delegate_call in contracts_data
+        )
+
+    def test_safe_l2_display_name(self):
+        # Contract name and display name should be correctly generated
+        self._assert_contracts(
+            {
+                "0x3E5c63644E683549055b9Be8653de26E0B4CD36E": (
+                    "GnosisSafeL2",
+                    "SafeL2 1.3.0",
+                    False,
+                ),
+                "0xA238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761": (
+                    "MultiSend",
+                    "Safe: MultiSend 1.3.0",
+                    False,
+                ),
+            }
         )
-        call_command(command, stdout=buf)
-        self.assertEqual(Contract.objects.count(), 1)
-        contract = Contract.objects.get(address=mulsisend_address)
-        self.assertIsNotNone(contract)
-        self.assertEqual(contract.name, "MultiSend")
-        self.assertEqual(contract.display_name, "Safe: MultiSend 1.4.1")
@@ -36,10 +36,10 @@ from .utils import just_test_if_mainnet_node
 
 class TestCollectiblesService(EthereumTestCaseMixin, TestCase):
     def setUp(self) -> None:
-        get_redis().flushall()
+        get_redis().flushdb()
 
     def tearDown(self) -> None:
-        get_redis().flushall()
+        get_redis().flushdb()
 
     def test_ipfs_to_http(self):
         regular_url = "http://testing-url/path/?arguments"
@@ -328,7 +328,7 @@ class TestCollectiblesService(EthereumTestCaseMixin, TestCase):
     @mock.patch.object(Erc721Manager, "get_token_uris", autospec=True)
     def test_get_token_uris(self, get_token_uris_mock: MagicMock):
         redis = get_redis()
-        redis.flushall()
+        redis.flushdb()
         token_uris = [
             "http://testing.com/12",
             None,
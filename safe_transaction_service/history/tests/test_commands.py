@@ -1,405 +1,137 @@
-import os.path
+import itertools
+import os
 import tempfile
-from io import StringIO
+from io import StringIO, TextIOBase
+from typing import Callable, Type
 from unittest import mock
 from unittest.mock import MagicMock, PropertyMock
 
 from django.core.management import CommandError, call_command
-from django.test import TestCase
+from django.test import TestCase, override_settings, tag
 
 from django_celery_beat.models import PeriodicTask
 from eth_account import Account
+from eth_account.signers.local import LocalAccount
 from safe_eth.eth.account_abstraction import BundlerClient
 from safe_eth.eth.ethereum_client import EthereumClient, EthereumNetwork
 from safe_eth.safe import Safe
+from safe_eth.safe.safe_signature import SafeSignatureType
 from safe_eth.safe.tests.safe_test_case import SafeTestCaseMixin
 from safe_eth.util.util import to_0x_hex_str
 
-from ..indexers import Erc20EventsIndexer, InternalTxIndexer, SafeEventsIndexer
+from ..indexers import (
+    Erc20EventsIndexer,
+    EthereumIndexer,
+    InternalTxIndexer,
+    SafeEventsIndexer,
+)
+from ..management.commands import (
+    check_index_problems,
+    index_erc20,
+    validate_tx_integrity,
+)
 from ..models import (
     IndexingStatus,
     InternalTxDecoded,
+    MultisigConfirmation,
+    MultisigTransaction,
     ProxyFactory,
+    SafeContract,
     SafeLastStatus,
     SafeMasterCopy,
 )
 from ..services import IndexServiceProvider
 from ..tasks import logger as task_logger
 from .factories import (
-    MultisigConfirmationFactory,
+    EthereumTxFactory,
     MultisigTransactionFactory,
     SafeContractFactory,
     SafeLastStatusFactory,
     SafeMasterCopyFactory,
 )
 
+# Deriving the public key of a new account is expensive, so a few are created upfront and reused
+next_account: Callable[[], LocalAccount] = itertools.cycle(
+    [Account.create() for _ in range(8)]
+).__next__
 
-class TestCommands(SafeTestCaseMixin, TestCase):
-    @mock.patch.object(EthereumClient, "get_network", autospec=True)
-    def _test_setup_service(
-        self,
-        ethereum_network: EthereumNetwork,
-        ethereum_client_get_network_mock: MagicMock,
-    ):
-        command = "setup_service"
-        ethereum_client_get_network_mock.return_value = ethereum_network
-        buf = StringIO()
-        self.assertEqual(SafeMasterCopy.objects.count(), 0)
-        self.assertEqual(ProxyFactory.objects.count(), 0)
-        self.assertEqual(PeriodicTask.objects.count(), 0)
 
-        call_command(command, stdout=buf)
-        self.assertIn(
-            f"Setting up {ethereum_network.name} safe addresses", buf.getvalue()
-        )
-        self.assertIn(
-            f"Setting up {ethereum_network.name} proxy factory addresses",
-            buf.getvalue(),
-        )
-        self.assertIn("Created Periodic Task", buf.getvalue())
-        self.assertNotIn("was already created", buf.getvalue())
-        self.assertGreater(SafeMasterCopy.objects.count(), 0)
-        self.assertGreater(ProxyFactory.objects.count(), 0)
-        self.assertGreater(PeriodicTask.objects.count(), 0)
+class NullOutput(TextIOBase):
+    """
+    Discard command output not checked by the tests
+    """
 
-        # Check last master copy was created
-        last_master_copy_address = "0x41675C099F32341bf84BFc5382aF534df5C7461a"
-        last_master_copy = SafeMasterCopy.objects.get(address=last_master_copy_address)
-        self.assertGreater(last_master_copy.initial_block_number, 0)
-        self.assertGreater(last_master_copy.tx_block_number, 0)
+    def write(self, s: str) -> int:
+        return len(s)
 
-        # Check last proxy factory was created
-        last_proxy_factory_address = "0x4e1DCf7AD4e460CfD30791CCC4F9c8a4f820ec67"
-        last_proxy_factory = ProxyFactory.objects.get(
-            address=last_proxy_factory_address
-        )
-        self.assertGreater(last_proxy_factory.initial_block_number, 0)
-        self.assertGreater(last_proxy_factory.tx_block_number, 0)
 
-        buf = StringIO()
-        call_command(command, stdout=buf)
-        self.assertIn(
-            f"Setting up {ethereum_network.name} safe addresses", buf.getvalue()
-        )
-        self.assertIn(
-            f"Setting up {ethereum_network.name} proxy factory addresses",
-            buf.getvalue(),
-        )
-        self.assertIn("Removing old tasks", buf.getvalue())
-        self.assertIn("Old tasks were removed", buf.getvalue())
-        self.assertIn("Created Periodic Task", buf.getvalue())
+null_output = NullOutput()
+
 
+class TestCommands(SafeTestCaseMixin, TestCase):
     def test_index_erc20(self):
-        command = "index_erc20"
-        buf = StringIO()
+        command = index_erc20.Command()
+        start_message = (
+            "Start indexing of erc20/721 events for out of sync addresses {addresses}"
+        )
+        end_message = "Indexing of erc20/721 events for out of sync addresses task processed 0 events"
+        # A single log handler is used for every scenario, `cm.output` is cleared between them
         with self.assertLogs(logger=task_logger) as cm:
-            call_command(command, stdout=buf)
+            call_command(command, stdout=null_output)
             self.assertIn("No addresses to process", cm.output[0])
 
-        buf = StringIO()
-        call_command(command, "--block-process-limit=10", stdout=buf)
-        self.assertIn("Setting block-process-limit to 10", buf.getvalue())
-
-        buf = StringIO()
-        call_command(
-            command,
-            "--block-process-limit=10",
-            "--block-process-limit-max=15",
-            stdout=buf,
-        )
-        self.assertIn("Setting block-process-limit to 10", buf.getvalue())
-        self.assertIn("Setting block-process-limit-max to 15", buf.getvalue())
-
-        with self.assertLogs(logger=task_logger) as cm:
-            safe_contract = SafeContractFactory()
-            addresses = {safe_contract.address}
             buf = StringIO()
-            call_command(command, stdout=buf)
-            self.assertIn(
-                f"Start indexing of erc20/721 events for out of sync addresses {addresses}",
-                cm.output[0],
-            )
-            self.assertIn(
-                "Indexing of erc20/721 events for out of sync addresses task processed 0 events",
-                cm.output[1],
-            )
+            call_command(command, "--block-process-limit=10", stdout=buf)
+            self.assertIn("Setting block-process-limit to 10", buf.getvalue())
 
-        with self.assertLogs(logger=task_logger) as cm:
-            safe_contract_2 = SafeContractFactory()
-            addresses = {safe_contract_2.address}
             buf = StringIO()
-            call_command(command, f"--addresses={safe_contract_2.address}", stdout=buf)
-            self.assertIn(
-                f"Start indexing of erc20/721 events for out of sync addresses {addresses}",
-                cm.output[0],
+            call_command(
+                command,
+                "--block-process-limit=10",
+                "--block-process-limit-max=15",
+                stdout=buf,
             )
+            text = buf.getvalue()
+            self.assertIn("Setting block-process-limit to 10", text)
+            self.assertIn("Setting block-process-limit-max to 15", text)
+
+            safe_contract = SafeContractFactory()
+            cm.output.clear()
+            call_command(command, stdout=null_output)
             self.assertIn(
-                "Indexing of erc20/721 events for out of sync addresses task processed 0 events",
-                cm.output[1],
+                start_message.format(addresses={safe_contract.address}), cm.output[0]
             )
+            self.assertIn(end_message, cm.output[1])
 
-        # Test sync task call
-        with self.assertLogs(logger=task_logger) as cm:
-            safe_contract_2 = SafeContractFactory()
-            addresses = {safe_contract_2.address}
-            buf = StringIO()
+            # Addresses are provided to the command, so both Safes can be inserted at once
+            ethereum_tx = EthereumTxFactory()
+            safe_contract_2, safe_contract_3 = SafeContract.objects.bulk_create(
+                SafeContract(address=next_account().address, ethereum_tx=ethereum_tx)
+                for _ in range(2)
+            )
+            cm.output.clear()
             call_command(
-                command, f"--addresses={safe_contract_2.address}", "--sync", stdout=buf
+                command, f"--addresses={safe_contract_2.address}", stdout=null_output
             )
             self.assertIn(
-                f"Start indexing of erc20/721 events for out of sync addresses {addresses}",
+                start_message.format(addresses={safe_contract_2.address}),
                 cm.output[0],
             )
-            self.assertIn(
-                "Indexing of erc20/721 events for out of sync addresses task processed 0 events",
-                cm.output[1],
-            )
-
-    @mock.patch.object(
-        EthereumClient, "current_block_number", new_callable=PropertyMock
-    )
-    def test_reindex_master_copies(self, current_block_number_mock: PropertyMock):
-        logger_name = "safe_transaction_service.history.services.index_service"
-        current_block_number_mock.return_value = 1000
-        command = "reindex_master_copies"
+            self.assertIn(end_message, cm.output[1])
 
-        with self.assertRaisesMessage(
-            CommandError, "the following arguments are required: --from-block-number"
-        ):
-            call_command(command)
-
-        buf = StringIO()
-        with self.assertLogs(logger_name, level="WARNING") as cm:
+            # Test sync task call
+            cm.output.clear()
             call_command(
                 command,
-                "--block-process-limit=11",
-                "--from-block-number=76",
-                stdout=buf,
+                f"--addresses={safe_contract_3.address}",
+                "--sync",
+                stdout=null_output,
             )
-            self.assertIn("Setting block-process-limit to 11", buf.getvalue())
-            self.assertIn("Setting from-block-number to 76", buf.getvalue())
-            self.assertIn("No addresses to process", cm.output[0])
-
-        safe_master_copy = SafeMasterCopyFactory(l2=False)
-        buf = StringIO()
-        with self.assertLogs(logger_name, level="INFO") as cm:
-            with mock.patch.object(
-                InternalTxIndexer, "find_relevant_elements", return_value=[]
-            ) as find_relevant_elements_mock:
-                IndexServiceProvider.del_singleton()
-                from_block_number = 100
-                block_process_limit = 500
-                call_command(
-                    command,
-                    f"--block-process-limit={block_process_limit}",
-                    f"--from-block-number={from_block_number}",
-                    stdout=buf,
-                )
-                expected_addresses = {safe_master_copy.address}
-                self.assertIn(
-                    f"Start reindexing addresses {expected_addresses}",
-                    cm.output[0],
-                )
-                self.assertIn("found 0 traces/events", cm.output[1])
-                self.assertIn(
-                    f"End reindexing addresses {expected_addresses}",
-                    cm.output[3],
-                )
-                find_relevant_elements_mock.assert_any_call(
-                    {safe_master_copy.address},
-                    from_block_number,
-                    from_block_number + block_process_limit - 1,
-                )
-                find_relevant_elements_mock.assert_any_call(
-                    {safe_master_copy.address},
-                    from_block_number + block_process_limit,
-                    current_block_number_mock.return_value,
-                )
-                self.assertEqual(find_relevant_elements_mock.call_count, 2)
-
-        with self.settings(ETH_L2_NETWORK=True):
-            IndexServiceProvider.del_singleton()
-            buf = StringIO()
-            with self.assertLogs(logger_name, level="WARNING") as cm:
-                call_command(command, "--from-block-number=71", stdout=buf)
-            self.assertIn("No addresses to process", cm.output[0])
-
-            with self.assertLogs(logger_name, level="INFO") as cm:
-                with mock.patch.object(
-                    SafeEventsIndexer, "find_relevant_elements", return_value=[]
-                ) as find_relevant_elements_mock:
-                    safe_l2_master_copy = SafeMasterCopyFactory(l2=True)
-                    buf = StringIO()
-                    from_block_number = 200
-                    block_process_limit = 500
-                    call_command(
-                        command,
-                        f"--block-process-limit={block_process_limit}",
-                        f"--from-block-number={from_block_number}",
-                        stdout=buf,
-                    )
-                    expected_addresses = {safe_l2_master_copy.address}
-                    self.assertIn(
-                        f"Start reindexing addresses {expected_addresses}",
-                        cm.output[0],
-                    )
-                    self.assertIn("found 0 traces/events", cm.output[1])
-                    self.assertIn(
-                        f"End reindexing addresses {expected_addresses}",
-                        cm.output[3],
-                    )
-                    find_relevant_elements_mock.assert_any_call(
-                        {safe_l2_master_copy.address},
-                        from_block_number,
-                        from_block_number + block_process_limit - 1,
-                    )
-                    find_relevant_elements_mock.assert_any_call(
-                        {safe_l2_master_copy.address},
-                        from_block_number + block_process_limit,
-                        current_block_number_mock.return_value,
-                    )
-                    self.assertEqual(find_relevant_elements_mock.call_count, 2)
-        IndexServiceProvider.del_singleton()
-
-    @mock.patch.object(
-        EthereumClient, "current_block_number", new_callable=PropertyMock
-    )
-    def test_reindex_erc20_events(self, current_block_number_mock: PropertyMock):
-        logger_name = "safe_transaction_service.history.services.index_service"
-        current_block_number_mock.return_value = 1000
-        command = "reindex_erc20"
-
-        with self.assertRaisesMessage(
-            CommandError, "the following arguments are required: --from-block-number"
-        ):
-            call_command(command)
-
-        buf = StringIO()
-        with self.assertLogs(logger_name, level="WARNING") as cm:
-            call_command(
-                command,
-                "--block-process-limit=11",
-                "--from-block-number=76",
-                stdout=buf,
-            )
-            self.assertIn("Setting block-process-limit to 11", buf.getvalue())
-            self.assertIn("Setting from-block-number to 76", buf.getvalue())
-            self.assertIn("No addresses to process", cm.output[0])
-
-        safe_contract = SafeContractFactory()
-        buf = StringIO()
-        with self.assertLogs(logger_name, level="INFO") as cm:
-            with mock.patch.object(
-                Erc20EventsIndexer, "find_relevant_elements", return_value=[]
-            ) as find_relevant_elements_mock:
-                IndexServiceProvider.del_singleton()
-                from_block_number = 100
-                block_process_limit = 500
-                call_command(
-                    command,
-                    f"--block-process-limit={block_process_limit}",
-                    f"--from-block-number={from_block_number}",
-                    stdout=buf,
-                )
-                expected_addresses = {safe_contract.address}
-                self.assertIn(
-                    f"Start reindexing addresses {expected_addresses}",
-                    cm.output[0],
-                )
-                self.assertIn("found 0 traces/events", cm.output[1])
-                self.assertIn(
-                    f"End reindexing addresses {expected_addresses}",
-                    cm.output[3],
-                )
-                find_relevant_elements_mock.assert_any_call(
-                    {safe_contract.address},
-                    from_block_number,
-                    from_block_number + block_process_limit - 1,
-                )
-                find_relevant_elements_mock.assert_any_call(
-                    {safe_contract.address},
-                    from_block_number + block_process_limit,
-                    current_block_number_mock.return_value,
-                )
-                self.assertEqual(find_relevant_elements_mock.call_count, 2)
-        IndexServiceProvider.del_singleton()
-
-    def test_setup_service_mainnet(self):
-        self.assertEqual(
-            IndexingStatus.objects.get_erc20_721_indexing_status().block_number, 0
-        )
-        self._test_setup_service(EthereumNetwork.MAINNET)
-        first_safe_block_deployed = (
-            6569433  # 0.0.2 deployment block, first Safe contract
-        )
-        self.assertEqual(
-            IndexingStatus.objects.get_erc20_721_indexing_status().block_number,
-            first_safe_block_deployed,
-        )
-
-        # Check last master copy was created
-        last_master_copy_address = "0x6851D6fDFAfD08c0295C392436245E5bc78B0185"
-        last_master_copy_initial_block = 10329734
-        last_master_copy = SafeMasterCopy.objects.get(address=last_master_copy_address)
-        self.assertEqual(
-            last_master_copy.initial_block_number, last_master_copy_initial_block
-        )
-        self.assertEqual(
-            last_master_copy.tx_block_number, last_master_copy_initial_block
-        )
-
-        # Check last proxy factory was created
-        last_proxy_factory_address = "0x76E2cFc1F5Fa8F6a5b3fC4c8F4788F0116861F9B"
-        last_proxy_factory_initial_block = 9084508
-        last_proxy_factory = ProxyFactory.objects.get(
-            address=last_proxy_factory_address
-        )
-        self.assertEqual(
-            last_proxy_factory.initial_block_number, last_proxy_factory_initial_block
-        )
-        self.assertEqual(
-            last_proxy_factory.tx_block_number, last_proxy_factory_initial_block
-        )
-
-        # At Nov 2023 we support 12 Master Copies, 3 L2 Master Copies and 6 Proxy Factories
-        self.assertEqual(SafeMasterCopy.objects.count(), 12)
-        self.assertEqual(SafeMasterCopy.objects.l2().count(), 3)
-        self.assertEqual(ProxyFactory.objects.count(), 6)
-
-    def test_setup_service_mainnet_erc20_indexing_setup(self):
-        # Test IndexingStatus ERC20 is not modified if higher than the oldest master copy
-        self.assertEqual(
-            IndexingStatus.objects.get_erc20_721_indexing_status().block_number, 0
-        )
-        first_safe_block_deployed = (
-            6569433  # 0.0.2 deployment block, first Safe contract
-        )
-        IndexingStatus.objects.set_erc20_721_indexing_status(
-            first_safe_block_deployed + 20
-        )
-        self._test_setup_service(EthereumNetwork.MAINNET)
-        self.assertEqual(
-            IndexingStatus.objects.get_erc20_721_indexing_status().block_number,
-            first_safe_block_deployed + 20,
-        )
-
-    def test_setup_service_sepolia(self):
-        self._test_setup_service(EthereumNetwork.SEPOLIA)
-
-    @mock.patch.object(EthereumClient, "is_contract", return_value=False)
-    @mock.patch.object(EthereumClient, "get_network", autospec=True)
-    def test_setup_service_not_valid_network(
-        self, ethereum_client_get_network_mock: MagicMock, is_contract_mock: MagicMock
-    ):
-        command = "setup_service"
-        for return_value in (EthereumNetwork.ROPSTEN, EthereumNetwork.UNKNOWN):
-            ethereum_client_get_network_mock.return_value = return_value
-            buf = StringIO()
-            call_command(command, stdout=buf)
             self.assertIn(
-                "Cannot find any SafeMasterCopy and ProxyFactory for chain id",
-                buf.getvalue(),
+                start_message.format(addresses={safe_contract_3.address}),
+                cm.output[0],
             )
+            self.assertIn(end_message, cm.output[1])
 
     @mock.patch.object(EthereumClient, "get_network", autospec=True)
     def test_setup_service_without_addresses(
@@ -414,13 +146,14 @@ class TestCommands(SafeTestCaseMixin, TestCase):
         ethereum_client_get_network_mock.return_value = ethereum_network
         buf = StringIO()
         call_command(command, stdout=buf)
+        text = buf.getvalue()
         self.assertNotIn(
             "Cannot find any SafeMasterCopy and ProxyFactory for chain id",
-            buf.getvalue(),
+            text,
         )
         self.assertIn(
             f"Setting up {ethereum_network.name} default safe addresses from chain with unknown init block",
-            buf.getvalue(),
+            text,
         )
         self.assertEqual(SafeMasterCopy.objects.count(), 2)
         self.assertEqual(ProxyFactory.objects.count(), 1)
@@ -436,8 +169,7 @@ class TestCommands(SafeTestCaseMixin, TestCase):
         command = "setup_service"
         ethereum_network = EthereumNetwork.GANACHE
         ethereum_client_get_network_mock.return_value = ethereum_network
-        buf = StringIO()
-        call_command(command, stdout=buf)
+        call_command(command, stdout=null_output)
         self.assertEqual(SafeMasterCopy.objects.count(), 2)
         self.assertEqual(ProxyFactory.objects.count(), 1)
         master_copy = SafeMasterCopy.objects.first()
@@ -448,8 +180,7 @@ class TestCommands(SafeTestCaseMixin, TestCase):
             "safe_transaction_service.history.management.commands.setup_service.MASTER_COPIES",
             new=mocked_addresses,
         ):
-            buf = StringIO()
-            call_command(command, stdout=buf)
+            call_command(command, stdout=null_output)
             master_copy_updated = SafeMasterCopy.objects.get(
                 address=master_copy.address
             )
@@ -457,97 +188,47 @@ class TestCommands(SafeTestCaseMixin, TestCase):
             self.assertEqual(master_copy_updated.version, "v1.1.1")
 
     def test_export_multisig_tx_data(self):
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            command = "export_multisig_tx_data"
-            arguments = "--file-name=" + os.path.join(tmpdirname, "result.csv")
-            buf = StringIO()
-            call_command(command, arguments, stdout=buf)
-            self.assertIn("Start exporting of 0", buf.getvalue())
-
-            MultisigTransactionFactory(origin="something")
-            MultisigTransactionFactory(
-                origin="another-something", ethereum_tx=None
-            )  # Will not be exported
-            MultisigTransactionFactory(origin={})  # Will not be exported
-            buf = StringIO()
-            call_command(command, arguments, stdout=buf)
-            self.assertIn("Start exporting of 1", buf.getvalue())
-
-    @mock.patch(
-        "safe_transaction_service.history.management.commands.check_chainid_matches.get_bundler_client",
-        return_value=None,
-    )
-    @mock.patch(
-        "safe_transaction_service.history.management.commands.check_chainid_matches.get_chain_id"
-    )
-    def test_check_chainid_matches(
-        self, get_chain_id_mock: MagicMock, get_bundler_client_mock: MagicMock
-    ):
-        command = "check_chainid_matches"
-
-        # Create ChainId model
-        get_chain_id_mock.return_value = EthereumNetwork.MAINNET.value
-        buf = StringIO()
-        call_command(command, stdout=buf)
-        self.assertIn("EthereumRPC chainId 1 looks good", buf.getvalue())
-
-        # Use different chainId
-        get_chain_id_mock.return_value = EthereumNetwork.GNOSIS.value
-        with self.assertRaisesMessage(
-            CommandError,
-            "EthereumRPC chainId 100 does not match previously used chainId 1",
-        ):
-            call_command(command)
-
-        # Check again with the initial chainId
-        get_chain_id_mock.return_value = EthereumNetwork.MAINNET.value
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+            file_name = f.name
+        self.addCleanup(os.unlink, file_name)
+        command = "export_multisig_tx_data"
+        arguments = f"--file-name={file_name}"
         buf = StringIO()
-        call_command(command, stdout=buf)
-        self.assertIn("EthereumRPC chainId 1 looks good", buf.getvalue())
-
-    @mock.patch.object(BundlerClient, "get_chain_id", return_value=1234)
-    @mock.patch(
-        "safe_transaction_service.history.management.commands.check_chainid_matches.get_bundler_client",
-        return_value=BundlerClient(""),
-    )
-    @mock.patch(
-        "safe_transaction_service.history.management.commands.check_chainid_matches.get_chain_id",
-        return_value=EthereumNetwork.MAINNET.value,
-    )
-    def test_check_chainid_bundler_matches(
-        self,
-        get_chain_id_mock: MagicMock,
-        get_bundler_client_mock: MagicMock,
-        bundler_get_chain_id_mock: MagicMock,
-    ):
-        command = "check_chainid_matches"
-        with self.assertRaisesMessage(
-            CommandError,
-            "ERC4337 BundlerClient chainId 1234 does not match EthereumClient chainId 1",
-        ):
-            call_command(command)
-
-        bundler_get_chain_id_mock.return_value = EthereumNetwork.MAINNET.value
-        buf = StringIO()
-        call_command(command, stdout=buf)
-        self.assertEqual(
-            "EthereumRPC chainId 1 looks good\nERC4337 BundlerClient chainId 1 looks good\n",
-            buf.getvalue(),
+        call_command(command, arguments, stdout=buf)
+        self.assertIn("Start exporting of 0", buf.getvalue())
+
+        ethereum_tx = EthereumTxFactory()
+        MultisigTransaction.objects.bulk_create(
+            [
+                MultisigTransactionFactory.build(
+                    origin="something", ethereum_tx=ethereum_tx
+                ),
+                MultisigTransactionFactory.build(
+                    origin="another-something", ethereum_tx=None
+                ),  # Will not be exported
+                MultisigTransactionFactory.build(
+                    origin={}, ethereum_tx=ethereum_tx
+                ),  # Will not be exported
+            ]
         )
+        buf = StringIO()
+        call_command(command, arguments, stdout=buf)
+        self.assertIn("Start exporting of 1", buf.getvalue())
 
+    @tag("slow")
     @mock.patch(
         "safe_transaction_service.history.management.commands.check_index_problems.settings.ETH_L2_NETWORK",
         return_value=True,
     )  # Testing L2 chain as ganache haven't tracing methods
     def test_check_index_problems(self, mock_eth_l2_network: MagicMock):
-        command = "check_index_problems"
+        command = check_index_problems.Command()
         buf = StringIO()
         # Test empty with empty SafeContract model
         call_command(command, stdout=buf)
         self.assertIn("Database haven't any address to be checked", buf.getvalue())
 
         # Should ignore Safe with nonce 0
-        owner = Account.create()
+        owner = next_account()
         safe = self.deploy_test_safe(
             number_owners=1,
             threshold=1,
@@ -555,45 +236,46 @@ class TestCommands(SafeTestCaseMixin, TestCase):
             initial_funding_wei=1000,
         )
         SafeContractFactory(address=safe.address)
-        SafeLastStatusFactory(nonce=0, address=safe.address)
+        safe_last_status = SafeLastStatusFactory(nonce=0, address=safe.address)
         buf = StringIO()
         call_command(command, stdout=buf)
         self.assertIn("Database haven't any address to be checked", buf.getvalue())
 
         # Should detect missing transactions
+        corrupted_message = (
+            f"Safe={safe.address} is corrupted, has some old transactions missing"
+        )
         data = b""
         value = 122
-        to = Account.create().address
+        to = next_account().address
         multisig_tx = safe.build_multisig_tx(to, value, data)
         multisig_tx.sign(owner.key)
         tx_hash, _ = multisig_tx.execute(self.ethereum_test_account.key)
-        SafeLastStatus.objects.filter(address=safe.address).update(nonce=1)
+        # Same `safe_last_status` is reused, `save()` inserts it again after the command deletes it
+        safe_last_status.nonce = 1
+        safe_last_status.save()
         self.assertEqual(InternalTxDecoded.objects.count(), 0)
         buf = StringIO()
         call_command(command, stdout=buf)
-        self.assertIn(
-            f"Safe={safe.address} is corrupted, has some old transactions missing",
-            buf.getvalue(),
-        )
+        self.assertIn(corrupted_message, buf.getvalue())
         self.assertEqual(InternalTxDecoded.objects.count(), 1)
         with self.assertRaises(SafeLastStatus.DoesNotExist):
             SafeLastStatus.objects.get(address=safe.address)
 
         # Should works with batch_size option
-        SafeLastStatusFactory(nonce=1, address=safe.address)
+        safe_last_status.nonce = 1
+        safe_last_status.save()
         buf = StringIO()
         call_command(command, "--batch-size=1", stdout=buf)
-        self.assertIn(
-            f"Safe={safe.address} is corrupted, has some old transactions missing",
-            buf.getvalue(),
-        )
+        self.assertIn(corrupted_message, buf.getvalue())
         self.assertEqual(InternalTxDecoded.objects.count(), 1)
         with self.assertRaises(SafeLastStatus.DoesNotExist):
             SafeLastStatus.objects.get(address=safe.address)
 
         # Should detect incorrect nonce
         with mock.patch.object(SafeLastStatus, "is_corrupted", return_value=False):
-            SafeLastStatusFactory(nonce=2, address=safe.address)
+            safe_last_status.nonce = 2
+            safe_last_status.save()
             buf = StringIO()
             call_command(command, stdout=buf)
             self.assertIn(
@@ -603,20 +285,27 @@ class TestCommands(SafeTestCaseMixin, TestCase):
             with self.assertRaises(SafeLastStatus.DoesNotExist):
                 SafeLastStatus.objects.get(address=safe.address)
 
+    @tag("slow")
     def test_validate_tx_integrity(self):
-        command = "validate_tx_integrity"
+        command = validate_tx_integrity.Command()
 
         buf = StringIO()
         call_command(command, stdout=buf)
         self.assertIn("Found 0 transactions", buf.getvalue())
 
-        account = Account.create()
-        safe_last_status = SafeLastStatusFactory(nonce=0, address=account.address)
+        account = next_account()
+        # Built once, the same way `validate_tx_integrity` does, so the safeTxHash matches
+        safe = Safe(account.address, self.ethereum_client)
+        safe_last_status = SafeLastStatusFactory(nonce=0, address=safe.address)
         multisig_transaction = MultisigTransactionFactory(
             ethereum_tx=None, nonce=0, safe=safe_last_status.address
         )
-        multisig_confirmation = MultisigConfirmationFactory(
-            multisig_transaction=multisig_transaction
+        # Confirmation without a signature, so it's not valid
+        multisig_confirmation = MultisigConfirmation.objects.create(
+            multisig_transaction=multisig_transaction,
+            multisig_transaction_hash=multisig_transaction.safe_tx_hash,
+            owner=next_account().address,
+            signature_type=SafeSignatureType.APPROVED_HASH.value,
         )
 
         # Signatures are not valid by default
@@ -648,7 +337,6 @@ class TestCommands(SafeTestCaseMixin, TestCase):
         self.assertNotIn("is not valid for multisig transaction", text)
 
         # Fix safeTxHash too
-        safe = Safe(multisig_transaction.safe, self.ethereum_client)
         safe_tx = safe.build_multisig_tx(
             multisig_transaction.to,
             multisig_transaction.value,
@@ -661,8 +349,10 @@ class TestCommands(SafeTestCaseMixin, TestCase):
             multisig_transaction.refund_receiver,
             safe_nonce=multisig_transaction.nonce,
         )
+        # Hash is computed once and reused for the next checks
+        safe_tx_hash = to_0x_hex_str(safe_tx.safe_tx_hash)
         multisig_transaction.delete()  # When replacing primary key, a new instance will be created
-        multisig_transaction.safe_tx_hash = to_0x_hex_str(safe_tx.safe_tx_hash)
+        multisig_transaction.safe_tx_hash = safe_tx_hash
         multisig_transaction.save()
 
         # SafeTxHash is good now
@@ -684,8 +374,316 @@ class TestCommands(SafeTestCaseMixin, TestCase):
         text = buf.getvalue()
         self.assertIn("Found 1 transactions", text)
         self.assertIn(
-            f"{multisig_transaction.safe_tx_hash} should not have signatures as it is not executed",
+            f"{safe_tx_hash} should not have signatures as it is not executed",
             text,
         )
         self.assertNotIn("is not matching", text)
         self.assertNotIn("is not valid for multisig transaction", text)
+
+
+class TestReindexCommands(TestCase):
+    """
+    Indexers are mocked, so `SafeTestCaseMixin` is not needed
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.current_block_number_mock = cls.enterClassContext(
+            mock.patch.object(
+                EthereumClient,
+                "current_block_number",
+                new_callable=PropertyMock,
+                return_value=1000,
+            )
+        )
+
+    def setUp(self):
+        super().setUp()
+        # IndexService depends on ETH_L2_NETWORK
+        IndexServiceProvider.del_singleton()
+        self.addCleanup(IndexServiceProvider.del_singleton)
+
+    def _test_reindex_command(
+        self, command: str, indexer_class: Type[EthereumIndexer], factory: Callable
+    ):
+        """
+        :param command: Reindex command name
+        :param indexer_class: Indexer expected to be used by the command
+        :param factory: Creates the model providing the address to be reindexed
+        """
+        logger_name = "safe_transaction_service.history.services.index_service"
+        with self.assertRaisesMessage(
+            CommandError,
+            "the following arguments are required: --from-block-number",
+        ):
+            call_command(command)
+
+        buf = StringIO()
+        with self.assertLogs(logger_name, level="WARNING") as cm:
+            call_command(
+                command,
+                "--block-process-limit=11",
+                "--from-block-number=76",
+                stdout=buf,
+            )
+            text = buf.getvalue()
+            self.assertIn("Setting block-process-limit to 11", text)
+            self.assertIn("Setting from-block-number to 76", text)
+            self.assertIn("No addresses to process", cm.output[0])
+
+        address = factory().address
+        expected_addresses = {address}
+        with self.assertLogs(logger_name, level="INFO") as cm:
+            with mock.patch.object(
+                indexer_class, "find_relevant_elements", return_value=[]
+            ) as find_relevant_elements_mock:
+                from_block_number = 100
+                block_process_limit = 500
+                call_command(
+                    command,
+                    f"--block-process-limit={block_process_limit}",
+                    f"--from-block-number={from_block_number}",
+                    stdout=null_output,
+                )
+                self.assertIn(
+                    f"Start reindexing addresses {expected_addresses}", cm.output[0]
+                )
+                self.assertIn("found 0 traces/events", cm.output[1])
+                self.assertIn(
+                    f"End reindexing addresses {expected_addresses}", cm.output[3]
+                )
+                find_relevant_elements_mock.assert_any_call(
+                    expected_addresses,
+                    from_block_number,
+                    from_block_number + block_process_limit - 1,
+                )
+                find_relevant_elements_mock.assert_any_call(
+                    expected_addresses,
+                    from_block_number + block_process_limit,
+                    self.current_block_number_mock.return_value,
+                )
+                self.assertEqual(find_relevant_elements_mock.call_count, 2)
+
+    def test_reindex_commands(self):
+        # command, indexer used, factory for the reindexed address
+        reindex_scenarios = [
+            (
+                "reindex_master_copies",
+                InternalTxIndexer,
+                lambda: SafeMasterCopyFactory(l2=False),
+            ),
+            ("reindex_erc20", Erc20EventsIndexer, SafeContractFactory),
+        ]
+        for command, indexer_class, factory in reindex_scenarios:
+            with self.subTest(command=command):
+                self._test_reindex_command(command, indexer_class, factory)
+
+    @override_settings(ETH_L2_NETWORK=True)
+    def test_reindex_master_copies_l2(self):
+        # Not L2 master copies must be ignored
+        SafeMasterCopyFactory(l2=False)
+        self._test_reindex_command(
+            "reindex_master_copies",
+            SafeEventsIndexer,
+            lambda: SafeMasterCopyFactory(l2=True),
+        )
+
+
+class TestCommandsWithoutSafeContracts(TestCase):
+    """
+    Commands not requiring Safe contracts deployed on the test node,
+    so `SafeTestCaseMixin` is not needed
+    """
+
+    @mock.patch.object(EthereumClient, "is_contract", return_value=False)
+    @mock.patch.object(EthereumClient, "get_network", autospec=True)
+    def test_setup_service_not_valid_network(
+        self, ethereum_client_get_network_mock: MagicMock, is_contract_mock: MagicMock
+    ):
+        command = "setup_service"
+        for return_value in (EthereumNetwork.ROPSTEN, EthereumNetwork.UNKNOWN):
+            ethereum_client_get_network_mock.return_value = return_value
+            buf = StringIO()
+            call_command(command, stdout=buf)
+            self.assertIn(
+                "Cannot find any SafeMasterCopy and ProxyFactory for chain id",
+                buf.getvalue(),
+            )
+
+    @mock.patch(
+        "safe_transaction_service.history.management.commands.check_chainid_matches.get_bundler_client",
+        return_value=None,
+    )
+    @mock.patch(
+        "safe_transaction_service.history.management.commands.check_chainid_matches.get_chain_id"
+    )
+    def test_check_chainid_matches(
+        self, get_chain_id_mock: MagicMock, get_bundler_client_mock: MagicMock
+    ):
+        command = "check_chainid_matches"
+
+        # Create ChainId model
+        get_chain_id_mock.return_value = EthereumNetwork.MAINNET.value
+        buf = StringIO()
+        call_command(command, stdout=buf)
+        self.assertIn("EthereumRPC chainId 1 looks good", buf.getvalue())
+
+        # Use different chainId
+        get_chain_id_mock.return_value = EthereumNetwork.GNOSIS.value
+        with self.assertRaisesMessage(
+            CommandError,
+            "EthereumRPC chainId 100 does not match previously used chainId 1",
+        ):
+            call_command(command)
+
+        # Check again with the initial chainId
+        get_chain_id_mock.return_value = EthereumNetwork.MAINNET.value
+        buf = StringIO()
+        call_command(command, stdout=buf)
+        self.assertIn("EthereumRPC chainId 1 looks good", buf.getvalue())
+
+    @mock.patch.object(BundlerClient, "get_chain_id", return_value=1234)
+    @mock.patch(
+        "safe_transaction_service.history.management.commands.check_chainid_matches.get_bundler_client",
+        return_value=BundlerClient(""),
+    )
+    @mock.patch(
+        "safe_transaction_service.history.management.commands.check_chainid_matches.get_chain_id",
+        return_value=EthereumNetwork.MAINNET.value,
+    )
+    def test_check_chainid_bundler_matches(
+        self,
+        get_chain_id_mock: MagicMock,
+        get_bundler_client_mock: MagicMock,
+        bundler_get_chain_id_mock: MagicMock,
+    ):
+        command = "check_chainid_matches"
+        with self.assertRaisesMessage(
+            CommandError,
+            "ERC4337 BundlerClient chainId 1234 does not match EthereumClient chainId 1",
+        ):
+            call_command(command)
+
+        bundler_get_chain_id_mock.return_value = EthereumNetwork.MAINNET.value
+        buf = StringIO()
+        call_command(command, stdout=buf)
+        self.assertEqual(
+            "EthereumRPC chainId 1 looks good\nERC4337 BundlerClient chainId 1 looks good\n",
+            buf.getvalue(),
+        )
+
+
+class SetupServiceTestMixin:
+    ethereum_network: EthereumNetwork
+
+    @classmethod
+    def _run_setup_service(cls) -> str:
+        """
+        :return: `setup_service` command output for the `ethereum_network` of the class
+        """
+        buf = StringIO()
+        with mock.patch.object(
+            EthereumClient,
+            "get_network",
+            autospec=True,
+            return_value=cls.ethereum_network,
+        ):
+            call_command("setup_service", stdout=buf)
+        return buf.getvalue()
+
+    @classmethod
+    def setUpTestData(cls):
+        # Populate database just once for every test in the class
+        cls.setup_output = cls._run_setup_service()
+
+    def _assert_setup_side_effects(self, output: str):
+        self.assertIn(f"Setting up {self.ethereum_network.name} safe addresses", output)
+        self.assertIn(
+            f"Setting up {self.ethereum_network.name} proxy factory addresses",
+            output,
+        )
+        self.assertIn("Created Periodic Task", output)
+        self.assertGreater(SafeMasterCopy.objects.count(), 0)
+        self.assertGreater(ProxyFactory.objects.count(), 0)
+        self.assertGreater(PeriodicTask.objects.count(), 0)
+
+    def test_setup_service(self):
+        self._assert_setup_side_effects(self.setup_output)
+        self.assertNotIn("was already created", self.setup_output)
+
+        # Check last master copy was created
+        last_master_copy_address = "0x41675C099F32341bf84BFc5382aF534df5C7461a"
+        last_master_copy = SafeMasterCopy.objects.get(address=last_master_copy_address)
+        self.assertGreater(last_master_copy.initial_block_number, 0)
+        self.assertGreater(last_master_copy.tx_block_number, 0)
+
+        # Check last proxy factory was created
+        last_proxy_factory_address = "0x4e1DCf7AD4e460CfD30791CCC4F9c8a4f820ec67"
+        last_proxy_factory = ProxyFactory.objects.get(
+            address=last_proxy_factory_address
+        )
+        self.assertGreater(last_proxy_factory.initial_block_number, 0)
+        self.assertGreater(last_proxy_factory.tx_block_number, 0)
+
+        # Run it again, old tasks must be removed
+        output = self._run_setup_service()
+        self._assert_setup_side_effects(output)
+        self.assertIn("Removing old tasks", output)
+        self.assertIn("Old tasks were removed", output)
+
+
+@tag("slow")
+class TestSetupServiceMainnetCommand(SetupServiceTestMixin, TestCase):
+    ethereum_network = EthereumNetwork.MAINNET
+    first_safe_block_deployed = 6569433  # 0.0.2 deployment block, first Safe contract
+
+    def test_setup_service_mainnet(self):
+        self.assertEqual(
+            IndexingStatus.objects.get_erc20_721_indexing_status().block_number,
+            self.first_safe_block_deployed,
+        )
+
+        # Check last master copy was created
+        last_master_copy_address = "0x6851D6fDFAfD08c0295C392436245E5bc78B0185"
+        last_master_copy_initial_block = 10329734
+        last_master_copy = SafeMasterCopy.objects.get(address=last_master_copy_address)
+        self.assertEqual(
+            last_master_copy.initial_block_number, last_master_copy_initial_block
+        )
+        self.assertEqual(
+            last_master_copy.tx_block_number, last_master_copy_initial_block
+        )
+
+        # Check last proxy factory was created
+        last_proxy_factory_address = "0x76E2cFc1F5Fa8F6a5b3fC4c8F4788F0116861F9B"
+        last_proxy_factory_initial_block = 9084508
+        last_proxy_factory = ProxyFactory.objects.get(
+            address=last_proxy_factory_address
+        )
+        self.assertEqual(
+            last_proxy_factory.initial_block_number, last_proxy_factory_initial_block
+        )
+        self.assertEqual(
+            last_proxy_factory.tx_block_number, last_proxy_factory_initial_block
+        )
+
+        # At Nov 2023 we support 12 Master Copies, 3 L2 Master Copies and 6 Proxy Factories
+        self.assertEqual(SafeMasterCopy.objects.count(), 12)
+        self.assertEqual(SafeMasterCopy.objects.l2().count(), 3)
+        self.assertEqual(ProxyFactory.objects.count(), 6)
+
+    def test_setup_service_mainnet_erc20_indexing_setup(self):
+        # Test IndexingStatus ERC20 is not modified if higher than the oldest master copy
+        IndexingStatus.objects.set_erc20_721_indexing_status(
+            self.first_safe_block_deployed + 20
+        )
+        self._run_setup_service()
+        self.assertEqual(
+            IndexingStatus.objects.get_erc20_721_indexing_status().block_number,
+            self.first_safe_block_deployed + 20,
+        )
+
+
+class TestSetupServiceSepoliaCommand(SetupServiceTestMixin, TestCase):
+    ethereum_network = EthereumNetwork.SEPOLIA
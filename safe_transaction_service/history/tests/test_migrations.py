@@ -1,19 +1,90 @@
+import itertools
 import json
+import operator
+import os
+from functools import reduce
+from typing import Callable, Dict, Sequence, Tuple
 
+from django.db.models import Q
 from django.test import TestCase
 from django.utils import timezone
 
 from django_test_migrations.migrator import Migrator
-from eth_account import Account
-from safe_eth.eth.utils import fast_keccak, fast_keccak_text
-from safe_eth.util.util import to_0x_hex_str
-
+from eth_typing import ChecksumAddress
+from safe_eth.eth.utils import fast_keccak, fast_to_checksum_address
+
+# Private keys are not needed, so random addresses are used instead of `Account.create()`
+next_address: Callable[[], ChecksumAddress] = itertools.cycle(
+    [fast_to_checksum_address(os.urandom(20)) for _ in range(32)]
+).__next__
+
+BLOCK_HASH = fast_keccak(b"34")
+PARENT_HASH = fast_keccak(b"12")
+TX_HASH = fast_keccak(b"tx-hash")
+
+# Safe apps links before and after migration 0073
+APPS_LINK_ORIGINS = (
+    {"not_url": "random"},
+    {"url": "https://app.zerion.io", "name": "Zerion"},
+    {
+        "url": "https://apps.gnosis-safe.io/tx-builder/",
+        "name": "Transaction Builder",
+    },
+)
+MIGRATED_APPS_LINK_ORIGINS = (
+    {"not_url": "random"},
+    {"url": "https://app.zerion.io", "name": "Zerion"},
+    {
+        "url": "https://apps-portal.safe.global/tx-builder/",
+        "name": "Transaction Builder",
+    },
+)
+
+
+def fake_safe_tx_hash(index: int) -> str:
+    """
+    Tests only need unique primary keys, so there's no need to hash anything
+
+    :param index:
+    :return: safeTxHash built from the ``index``
+    """
+    return "0x" + index.to_bytes(32, "big").hex()
+
+
+class MigrationTestMixin:
+    """
+    `initial_migration` is applied just once for every test in the class. As every test
+    runs inside its own savepoint, changes done by the tested migration are rolled back
+    """
+
+    initial_migration: Tuple[str, str]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Tables are dropped inside the class transaction. As `TestCase` does for `setUpTestData`,
+        # roll it back if migrating fails, so next test classes don't run with a broken schema
+        try:
+            # Migration graph is reloaded from the database before applying the tested migration,
+            # so the same `Migrator` can be reused after every test rollback
+            cls.migrator = Migrator(database="default")
+            cls.initial_state = cls.migrator.apply_initial_migration(
+                cls.initial_migration
+            )
+            cls.setUpInitialStateData()
+        except Exception:
+            cls._rollback_atomics(cls.cls_atomics)
+            raise
 
-class TestMigrations(TestCase):
-    def setUp(self) -> None:
-        self.migrator = Migrator(database="default")
+    @classmethod
+    def setUpInitialStateData(cls):
+        """
+        Like `setUpTestData`, but run after `initial_migration` is applied, so models
+        from `initial_state` can be used. Rows are rolled back with the class transaction
+        """
 
-    def build_ethereum_tx(self, ethereum_block_class, ethereum_tx_class):
+    @staticmethod
+    def build_ethereum_tx(ethereum_block_class, ethereum_tx_class):
         """
         Factory boy does not work with migrations
 
@@ -26,23 +97,25 @@ class TestMigrations(TestCase):
             gas_limit=2,
             gas_used=2,
             timestamp=timezone.now(),
-            block_hash=fast_keccak(b"34"),
-            parent_hash=fast_keccak(b"12"),
+            block_hash=BLOCK_HASH,
+            parent_hash=PARENT_HASH,
         )
 
         return ethereum_tx_class.objects.create(
             block=ethereum_block,
-            tx_hash=fast_keccak(b"tx-hash"),
+            tx_hash=TX_HASH,
             gas=23000,
             gas_price=1,
             nonce=0,
             value=0,
         )
 
+
+class TestMigrationsFrom0067(MigrationTestMixin, TestCase):
+    initial_migration = ("history", "0067_auto_20220705_1545")
+
     def test_migration_forward_0068(self):
-        old_state = self.migrator.apply_initial_migration(
-            ("history", "0067_auto_20220705_1545")
-        )
+        old_state = self.initial_state
         MultisigTransactionOld = old_state.apps.get_model(
             "history", "MultisigTransaction"
         )
@@ -52,10 +125,11 @@ class TestMigrations(TestCase):
             "",
             None,
         ]
-        for origin in origins:
-            MultisigTransactionOld.objects.create(
-                safe_tx_hash=to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origin}")),
-                safe=Account.create().address,
+        safe_tx_hashes = [fake_safe_tx_hash(i) for i in range(len(origins))]
+        MultisigTransactionOld.objects.bulk_create(
+            MultisigTransactionOld(
+                safe_tx_hash=safe_tx_hash,
+                safe=next_address(),
                 value=0,
                 operation=0,
                 safe_tx_gas=0,
@@ -64,6 +138,8 @@ class TestMigrations(TestCase):
                 nonce=0,
                 origin=origin,
             )
+            for safe_tx_hash, origin in zip(safe_tx_hashes, origins)
+        )
 
         new_state = self.migrator.apply_tested_migration(
             ("history", "0068_alter_multisigtransaction_origin"),
@@ -72,36 +148,38 @@ class TestMigrations(TestCase):
             "history", "Multisigtransaction"
         )
 
+        multisig_transactions = MultisigTransactionNew.objects.in_bulk(safe_tx_hashes)
+
         # String should keep string
-        hash = to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origins[0]}"))
-        self.assertEqual(MultisigTransactionNew.objects.get(pk=hash).origin, origins[0])
+        self.assertEqual(multisig_transactions[safe_tx_hashes[0]].origin, origins[0])
 
         # String json should be converted to json
-        hash = to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origins[1]}"))
         self.assertEqual(
-            MultisigTransactionNew.objects.get(pk=hash).origin, json.loads(origins[1])
+            multisig_transactions[safe_tx_hashes[1]].origin,
+            json.loads(origins[1]),
         )
 
         # Empty string should be empty object
-        hash = to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origins[2]}"))
-        self.assertEqual(MultisigTransactionNew.objects.get(pk=hash).origin, {})
+        self.assertEqual(multisig_transactions[safe_tx_hashes[2]].origin, {})
 
         # None should be empty object
-        hash = to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origins[2]}"))
-        self.assertEqual(MultisigTransactionNew.objects.get(pk=hash).origin, {})
+        self.assertEqual(multisig_transactions[safe_tx_hashes[3]].origin, {})
+
+
+class TestMigrationsFrom0068(MigrationTestMixin, TestCase):
+    initial_migration = ("history", "0068_alter_multisigtransaction_origin")
 
     def test_migration_backward_0068(self):
-        new_state = self.migrator.apply_initial_migration(
-            ("history", "0068_alter_multisigtransaction_origin")
-        )
+        new_state = self.initial_state
         MultisigTransactionNew = new_state.apps.get_model(
             "history", "MultisigTransaction"
         )
         origins = ["{ TestString", {"url": "https://example.com", "name": "app"}, {}]
-        for origin in origins:
-            MultisigTransactionNew.objects.create(
-                safe_tx_hash=to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origin}")),
-                safe=Account.create().address,
+        safe_tx_hashes = [fake_safe_tx_hash(i) for i in range(len(origins))]
+        MultisigTransactionNew.objects.bulk_create(
+            MultisigTransactionNew(
+                safe_tx_hash=safe_tx_hash,
+                safe=next_address(),
                 value=0,
                 operation=0,
                 safe_tx_gas=0,
@@ -110,6 +188,8 @@ class TestMigrations(TestCase):
                 nonce=0,
                 origin=origin,
             )
+            for safe_tx_hash, origin in zip(safe_tx_hashes, origins)
+        )
 
         old_state = self.migrator.apply_tested_migration(
             ("history", "0067_auto_20220705_1545"),
@@ -118,43 +198,34 @@ class TestMigrations(TestCase):
             "history", "Multisigtransaction"
         )
 
+        multisig_transactions = MultisigTransactionOld.objects.in_bulk(safe_tx_hashes)
+
         # String should keep string
-        hash = to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origins[0]}"))
-        self.assertEqual(MultisigTransactionOld.objects.get(pk=hash).origin, origins[0])
+        self.assertEqual(multisig_transactions[safe_tx_hashes[0]].origin, origins[0])
 
         # Json should be converted to a string json
-        hash = to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origins[1]}"))
         self.assertEqual(
-            MultisigTransactionOld.objects.get(pk=hash).origin, json.dumps(origins[1])
+            multisig_transactions[safe_tx_hashes[1]].origin,
+            json.dumps(origins[1]),
         )
 
         # Empty object should be None
-        hash = to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origins[2]}"))
-        self.assertEqual(MultisigTransactionOld.objects.get(pk=hash).origin, None)
+        self.assertEqual(multisig_transactions[safe_tx_hashes[2]].origin, None)
 
     def test_migration_forward_0069(self):
-        old_state = self.migrator.apply_initial_migration(
-            ("history", "0068_alter_multisigtransaction_origin")
-        )
+        old_state = self.initial_state
 
         EthereumBlock = old_state.apps.get_model("history", "EthereumBlock")
         EthereumTx = old_state.apps.get_model("history", "EthereumTx")
         ethereum_tx = self.build_ethereum_tx(EthereumBlock, EthereumTx)
         SafeContract = old_state.apps.get_model("history", "SafeContract")
-        SafeContract.objects.create(
-            address=Account.create().address,
-            erc20_block_number=8,
-            ethereum_tx=ethereum_tx,
-        )
-        SafeContract.objects.create(
-            address=Account.create().address,
-            erc20_block_number=4,
-            ethereum_tx=ethereum_tx,
-        )
-        SafeContract.objects.create(
-            address=Account.create().address,
-            erc20_block_number=15,
-            ethereum_tx=ethereum_tx,
+        SafeContract.objects.bulk_create(
+            SafeContract(
+                address=next_address(),
+                erc20_block_number=erc20_block_number,
+                ethereum_tx=ethereum_tx,
+            )
+            for erc20_block_number in (8, 4, 15)
         )
         new_state = self.migrator.apply_tested_migration(
             ("history", "0069_indexingstatus_and_more"),
@@ -163,19 +234,17 @@ class TestMigrations(TestCase):
         self.assertEqual(IndexingStatus.objects.get().block_number, 4)
 
     def test_migration_forward_0069_using_master_copies(self):
-        old_state = self.migrator.apply_initial_migration(
-            ("history", "0068_alter_multisigtransaction_origin")
-        )
+        old_state = self.initial_state
 
         SafeMasterCopy = old_state.apps.get_model("history", "SafeMasterCopy")
         SafeMasterCopy.objects.create(
-            address=Account.create().address,
+            address=next_address(),
             initial_block_number=15,
             tx_block_number=23,
             l2=False,
         )
         SafeMasterCopy.objects.create(
-            address=Account.create().address,
+            address=next_address(),
             initial_block_number=16,
             tx_block_number=42,
             l2=True,
@@ -187,26 +256,28 @@ class TestMigrations(TestCase):
         IndexingStatus = new_state.apps.get_model("history", "IndexingStatus")
         self.assertEqual(IndexingStatus.objects.get().block_number, 15)
 
-    def test_migration_backward_0069(self):
-        new_state = self.migrator.apply_initial_migration(
-            ("history", "0069_indexingstatus_and_more"),
+
+class TestMigrationsFrom0069(MigrationTestMixin, TestCase):
+    initial_migration = ("history", "0069_indexingstatus_and_more")
+
+    @classmethod
+    def setUpInitialStateData(cls):
+        # Tests only read it
+        cls.ethereum_tx = cls.build_ethereum_tx(
+            cls.initial_state.apps.get_model("history", "EthereumBlock"),
+            cls.initial_state.apps.get_model("history", "EthereumTx"),
         )
+
+    def test_migration_backward_0069(self):
+        new_state = self.initial_state
         IndexingStatus = new_state.apps.get_model("history", "IndexingStatus")
         self.assertEqual(IndexingStatus.objects.get().block_number, 0)
         IndexingStatus.objects.update(block_number=4)
 
-        EthereumBlock = new_state.apps.get_model("history", "EthereumBlock")
-        EthereumTx = new_state.apps.get_model("history", "EthereumTx")
         SafeContract = new_state.apps.get_model("history", "SafeContract")
-        ethereum_tx = self.build_ethereum_tx(EthereumBlock, EthereumTx)
-        SafeContract.objects.create(
-            address=Account.create().address, ethereum_tx=ethereum_tx
-        )
-        SafeContract.objects.create(
-            address=Account.create().address, ethereum_tx=ethereum_tx
-        )
-        SafeContract.objects.create(
-            address=Account.create().address, ethereum_tx=ethereum_tx
+        SafeContract.objects.bulk_create(
+            SafeContract(address=next_address(), ethereum_tx=self.ethereum_tx)
+            for _ in range(3)
         )
 
         old_state = self.migrator.apply_tested_migration(
@@ -216,25 +287,15 @@ class TestMigrations(TestCase):
         self.assertEqual(SafeContract.objects.filter(erc20_block_number=4).count(), 3)
 
     def test_migration_backward_0069_db_empty(self):
-        new_state = self.migrator.apply_initial_migration(
-            ("history", "0069_indexingstatus_and_more"),
-        )
+        new_state = self.initial_state
         IndexingStatus = new_state.apps.get_model("history", "IndexingStatus")
         self.assertEqual(IndexingStatus.objects.get().block_number, 0)
         IndexingStatus.objects.all().delete()
 
-        EthereumBlock = new_state.apps.get_model("history", "EthereumBlock")
-        EthereumTx = new_state.apps.get_model("history", "EthereumTx")
         SafeContract = new_state.apps.get_model("history", "SafeContract")
-        ethereum_tx = self.build_ethereum_tx(EthereumBlock, EthereumTx)
-        SafeContract.objects.create(
-            address=Account.create().address, ethereum_tx=ethereum_tx
-        )
-        SafeContract.objects.create(
-            address=Account.create().address, ethereum_tx=ethereum_tx
-        )
-        SafeContract.objects.create(
-            address=Account.create().address, ethereum_tx=ethereum_tx
+        SafeContract.objects.bulk_create(
+            SafeContract(address=next_address(), ethereum_tx=self.ethereum_tx)
+            for _ in range(3)
         )
 
         old_state = self.migrator.apply_tested_migration(
@@ -243,28 +304,59 @@ class TestMigrations(TestCase):
         SafeContract = old_state.apps.get_model("history", "SafeContract")
         self.assertEqual(SafeContract.objects.filter(erc20_block_number=0).count(), 3)
 
+
+class TestMigrationsFrom0072(MigrationTestMixin, TestCase):
+    initial_migration = ("history", "0072_safecontract_banned_and_more")
+
+    def _assert_origins(
+        self,
+        multisig_transaction_class,
+        safe_tx_hashes: Sequence[str],
+        expected_origins: Sequence[Dict[str, str]],
+    ) -> None:
+        """
+        Origins are compared by the database, so they are only loaded to report a failure
+
+        :param multisig_transaction_class: ``MultisigTransaction`` model of the migration state
+        :param safe_tx_hashes: safeTxHashes of the transactions to check
+        :param expected_origins: expected origin for every safeTxHash, in the same order
+        """
+        matching = multisig_transaction_class.objects.filter(
+            reduce(
+                operator.or_,
+                (
+                    Q(safe_tx_hash=safe_tx_hash, origin=origin)
+                    for safe_tx_hash, origin in zip(safe_tx_hashes, expected_origins)
+                ),
+            )
+        ).count()
+        if matching != len(expected_origins):
+            stored = list(
+                multisig_transaction_class.objects.filter(
+                    safe_tx_hash__in=safe_tx_hashes
+                )
+                .order_by("safe_tx_hash")
+                .values_list("safe_tx_hash", "origin")
+            )
+            self.fail(
+                f"{matching} of {len(expected_origins)} origins match, "
+                f"stored (safe_tx_hash, origin) are {stored}"
+            )
+
     def test_migration_forward_0073_safe_apps_links(self):
         """
         Migrate safe apps links from 'apps.gnosis-safe.io' -> 'apps-portal.safe.global'
         """
 
-        new_state = self.migrator.apply_initial_migration(
-            ("history", "0072_safecontract_banned_and_more"),
-        )
-        origins = [
-            {"not_url": "random"},
-            {"url": "https://app.zerion.io", "name": "Zerion"},
-            {
-                "url": "https://apps.gnosis-safe.io/tx-builder/",
-                "name": "Transaction Builder",
-            },
-        ]
+        new_state = self.initial_state
+        origins = APPS_LINK_ORIGINS
 
         MultisigTransaction = new_state.apps.get_model("history", "MultisigTransaction")
-        for origin in origins:
-            MultisigTransaction.objects.create(
-                safe_tx_hash=to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origin}")),
-                safe=Account.create().address,
+        safe_tx_hashes = [fake_safe_tx_hash(i) for i in range(len(origins))]
+        MultisigTransaction.objects.bulk_create(
+            MultisigTransaction(
+                safe_tx_hash=safe_tx_hash,
+                safe=next_address(),
                 value=0,
                 operation=0,
                 safe_tx_gas=0,
@@ -273,21 +365,15 @@ class TestMigrations(TestCase):
                 nonce=0,
                 origin=origin,
             )
+            for safe_tx_hash, origin in zip(safe_tx_hashes, origins)
+        )
 
         new_state = self.migrator.apply_tested_migration(
             ("history", "0073_safe_apps_links"),
         )
         MultisigTransaction = new_state.apps.get_model("history", "MultisigTransaction")
-        self.assertCountEqual(
-            MultisigTransaction.objects.values_list("origin", flat=True),
-            [
-                {"not_url": "random"},
-                {"url": "https://app.zerion.io", "name": "Zerion"},
-                {
-                    "url": "https://apps-portal.safe.global/tx-builder/",
-                    "name": "Transaction Builder",
-                },
-            ],
+        self._assert_origins(
+            MultisigTransaction, safe_tx_hashes, MIGRATED_APPS_LINK_ORIGINS
         )
 
     def test_migration_backward_0073_safe_apps_links(self):
@@ -295,24 +381,20 @@ class TestMigrations(TestCase):
         Migrate safe apps links from 'apps.gnosis-safe.io' -> 'apps-portal.safe.global'
         """
 
-        new_state = self.migrator.apply_initial_migration(
+        # 0073 only updates rows, so it's applied on top of the class initial state instead
+        # of building the whole 0073 state from scratch
+        new_state = self.migrator.apply_tested_migration(
             ("history", "0073_safe_apps_links"),
         )
 
-        origins = [
-            {"not_url": "random"},
-            {"url": "https://app.zerion.io", "name": "Zerion"},
-            {
-                "url": "https://apps.gnosis-safe.io/tx-builder/",
-                "name": "Transaction Builder",
-            },
-        ]
+        origins = APPS_LINK_ORIGINS
 
         MultisigTransaction = new_state.apps.get_model("history", "MultisigTransaction")
-        for origin in origins:
-            MultisigTransaction.objects.create(
-                safe_tx_hash=to_0x_hex_str(fast_keccak_text(f"multisig-tx-{origin}")),
-                safe=Account.create().address,
+        safe_tx_hashes = [fake_safe_tx_hash(i) for i in range(len(origins))]
+        MultisigTransaction.objects.bulk_create(
+            MultisigTransaction(
+                safe_tx_hash=safe_tx_hash,
+                safe=next_address(),
                 value=0,
                 operation=0,
                 safe_tx_gas=0,
@@ -321,29 +403,23 @@ class TestMigrations(TestCase):
                 nonce=0,
                 origin=origin,
             )
+            for safe_tx_hash, origin in zip(safe_tx_hashes, origins)
+        )
 
         new_state = self.migrator.apply_tested_migration(
             ("history", "0072_safecontract_banned_and_more"),
         )
 
         MultisigTransaction = new_state.apps.get_model("history", "MultisigTransaction")
-        self.assertCountEqual(
-            MultisigTransaction.objects.values_list("origin", flat=True),
-            [
-                {"not_url": "random"},
-                {"url": "https://app.zerion.io", "name": "Zerion"},
-                {
-                    "url": "https://apps.gnosis-safe.io/tx-builder/",
-                    "name": "Transaction Builder",
-                },
-            ],
-        )
+        self._assert_origins(MultisigTransaction, safe_tx_hashes, APPS_LINK_ORIGINS)
+
+
+class TestMigrationsFrom0081(MigrationTestMixin, TestCase):
+    initial_migration = ("history", "0081_internaltx_history_internal_transfer_from")
 
     def test_migration_0082_safecontract_created(self):
         # Add `created` field to SafeContract
-        old_state = self.migrator.apply_initial_migration(
-            ("history", "0081_internaltx_history_internal_transfer_from"),
-        )
+        old_state = self.initial_state
 
         SafeContract = old_state.apps.get_model("history", "SafeContract")
 
@@ -351,7 +427,7 @@ class TestMigrations(TestCase):
         EthereumTx = old_state.apps.get_model("history", "EthereumTx")
         ethereum_tx = self.build_ethereum_tx(EthereumBlock, EthereumTx)
         SafeContract.objects.create(
-            address=Account.create().address,
+            address=next_address(),
             ethereum_tx=ethereum_tx,
         )
 
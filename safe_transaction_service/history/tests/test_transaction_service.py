@@ -28,11 +28,11 @@ class TestTransactionService(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.transaction_service: TransactionService = TransactionServiceProvider()
-        cls.transaction_service.redis.flushall()
+        cls.transaction_service.redis.flushdb()
 
     def tearDown(self):
         super().tearDown()
-        self.transaction_service.redis.flushall()
+        self.transaction_service.redis.flushdb()
 
     def test_get_all_tx_identifiers(self):
         transaction_service: TransactionService = self.transaction_service
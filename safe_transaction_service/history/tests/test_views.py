@@ -90,10 +90,10 @@ logger = logging.getLogger(__name__)
 
 class TestViews(SafeTestCaseMixin, APITestCase):
     def setUp(self):
-        get_redis().flushall()
+        get_redis().flushdb()
 
     def tearDown(self):
-        get_redis().flushall()
+        get_redis().flushdb()
 
     def test_about_view(self):
         url = reverse("v1:history:about")
@@ -18,10 +18,10 @@ logger = logging.getLogger(__name__)
 
 class TestTasks(TestCase):
     def setUp(self) -> None:
-        get_redis().flushall()
+        get_redis().flushdb()
 
     def tearDown(self) -> None:
-        get_redis().flushall()
+        get_redis().flushdb()
 
     @mock.patch(
         "safe_transaction_service.tokens.tasks.get_ethereum_network",
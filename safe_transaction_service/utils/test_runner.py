@@ -0,0 +1,57 @@
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.test import runner
+from django.test.runner import DiscoverRunner, ParallelTestSuite
+
+from .redis import get_redis
+
+# Redis provides 16 databases by default (0-15), database `0` is kept for non parallel runs
+MAX_PARALLEL_TEST_WORKERS = 15
+
+
+def use_worker_redis_database(worker_index: int) -> None:
+    """
+    Assign a dedicated Redis database to a parallel test worker,
+    so workers don't clash when sharing Redis (cache, locks, celery...)
+
+    :param worker_index: 0-based index of the worker, database ``worker_index + 1`` will be used
+    :raises ValueError: if there are not enough Redis databases for the worker
+    """
+    if not 0 <= worker_index < MAX_PARALLEL_TEST_WORKERS:
+        raise ValueError(
+            f"Redis databases are only available for {MAX_PARALLEL_TEST_WORKERS} parallel test workers, "
+            f"worker with index {worker_index} cannot be used. Use less workers"
+        )
+    redis_url = urlparse(settings.REDIS_URL)
+    settings.REDIS_URL = redis_url._replace(path=f"/{worker_index + 1}").geturl()
+    get_redis.cache_clear()
+
+
+def redis_parallel_init_worker(counter, *args, **kwargs):
+    """
+    Initialize a Django parallel test worker with its own Redis database
+
+    :param counter: shared counter used by Django to assign worker ids
+    """
+    # `_init_worker` and `_worker_id` (starting at 1) are private, check them when upgrading Django (5.0)
+    runner._init_worker(counter, *args, **kwargs)
+    use_worker_redis_database(runner._worker_id - 1)
+
+
+class RedisParallelTestSuite(ParallelTestSuite):
+    init_worker = redis_parallel_init_worker
+
+    def __init__(self, subsuites, processes, *args, **kwargs):
+        # Every worker needs its own Redis database
+        super().__init__(
+            subsuites, min(processes, MAX_PARALLEL_TEST_WORKERS), *args, **kwargs
+        )
+
+
+class ParallelRunner(DiscoverRunner):
+    """
+    Test runner for `python manage.py test --parallel auto`
+    """
+
+    parallel_test_suite = RedisParallelTestSuite